@@ -1,94 +1,242 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.middleware.gzip import GZipMiddleware
+from pydantic import BaseModel, ConfigDict
+import asyncio
+import atexit
 import logging
-import subprocess
-from pathlib import Path
-import sys
-import tempfile
+import multiprocessing
+import queue
+import threading
 import os
+from contextlib import asynccontextmanager
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener
 from typing import Optional
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('api_execution.log')
-    ]
-)
+from sandbox import EXEC_TIMEOUT, USER_CODE_FILENAME, OutputLimitError, init_worker, run_user_code
+
+# Per-request execution logs are DEBUG; set LOG_LEVEL=DEBUG to see them
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "WARNING").upper()
+if LOG_LEVEL not in LOG_LEVELS:
+    raise SystemExit(
+        f"Invalid LOG_LEVEL {LOG_LEVEL!r}; expected one of: {', '.join(LOG_LEVELS)}"
+    )
+
+# Seconds between flushes of buffered log records
+LOG_FLUSH_INTERVAL = 1.0
+
+def _configure_logging():
+    """
+    Configure logging for the server process.
+    
+    Records are handed to a background thread through a queue so request
+    handlers never block on console or disk writes. This runs from the
+    lifespan handler rather than at import time because pool workers
+    re-import this module, and each would otherwise open its own handle on
+    the log file.
+    """
+    root_logger = logging.getLogger()
+    if root_logger.handlers:
+        return
+
+    log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(log_formatter)
+    file_handler = logging.FileHandler('api_execution.log')
+    file_handler.setFormatter(log_formatter)
+    # Batch file writes; errors are written out immediately
+    buffered_file_handler = MemoryHandler(
+        capacity=200,
+        flushLevel=logging.ERROR,
+        target=file_handler,
+        flushOnClose=True
+    )
+
+    log_queue = queue.Queue(-1)
+    log_listener = QueueListener(
+        log_queue, stream_handler, buffered_file_handler, respect_handler_level=True
+    )
+    log_listener.start()
+
+    # Flush buffered records periodically so low-volume logs still reach disk
+    log_flush_stop = threading.Event()
+
+    def _flush_logs_periodically():
+        while not log_flush_stop.wait(LOG_FLUSH_INTERVAL):
+            buffered_file_handler.flush()
+
+    threading.Thread(target=_flush_logs_periodically, daemon=True).start()
+
+    def _shutdown_logging():
+        log_listener.stop()
+        log_flush_stop.set()
+        buffered_file_handler.close()
+        file_handler.close()
+
+    atexit.register(_shutdown_logging)
+
+    root_logger.setLevel(LOG_LEVEL)
+    root_logger.addHandler(QueueHandler(log_queue))
+
+# Long-lived workers started from the forkserver; each script runs in a
+# child forked from a worker (see sandbox.py), so the interpreter and this
+# module are only imported once per worker rather than once per request
+ctx = multiprocessing.get_context("forkserver")
+ctx.set_forkserver_preload(["sandbox"])
+POOL_SIZE = os.cpu_count()
+EXECUTOR_POOL = None
+# Limits in-flight submissions to the number of workers, so requests wait
+# here instead of in the pool's queue and the execution timeout only
+# starts once a worker is free
+EXECUTOR_SLOTS = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Configure logging and manage the worker pool used to run user scripts"""
+    global EXECUTOR_POOL, EXECUTOR_SLOTS
+    _configure_logging()
+    EXECUTOR_POOL = ctx.Pool(processes=POOL_SIZE, initializer=init_worker)
+    EXECUTOR_SLOTS = asyncio.Semaphore(POOL_SIZE)
+    try:
+        yield
+    finally:
+        # terminate() rather than close() so shutdown never waits on running
+        # scripts; workers kill their script's process group on the way out.
+        # Run in a thread since terminate() joins the pool's handler threads
+        await asyncio.to_thread(EXECUTOR_POOL.terminate)
+        await asyncio.to_thread(EXECUTOR_POOL.join)
 
 app = FastAPI(
     title="Script Execution API",
     description="API for executing Python scripts",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
+# Frontend URLs; a frozenset makes the per-request origin check a hash lookup
+ALLOWED_ORIGINS = frozenset({
+    "http://localhost:3000",
+    "https://localhost:3000",
+    "http://localhost:8000",
+    "https://localhost:8443",
+    "https://gauntlet-daily-challenge-phi.vercel.app"
+})
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[
-        "http://localhost:3000",
-        "https://localhost:3000",
-        "http://localhost:8000",
-        "https://localhost:8443",
-        "https://gauntlet-daily-challenge-phi.vercel.app"
-    ],  # Frontend URLs
+    allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
 )
 
+# Compress larger responses such as verbose script output; added after CORS
+# so it wraps the CORS middleware
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 class ExecutionResponse(BaseModel):
     success: bool
     output: Optional[str] = None
     error: Optional[str] = None
 
+# Largest script accepted, as JSON code (characters) or upload (bytes)
+MAX_CODE_SIZE = 1_000_000
+
 class CodeRequest(BaseModel):
+    # Reject oversized payloads during validation, before any other work
+    model_config = ConfigDict(extra='forbid', str_max_length=MAX_CODE_SIZE)
+
     code: str
 
-async def execute_script(script_path: str) -> ExecutionResponse:
+def _submit_to_pool(func, args: tuple) -> asyncio.Future:
+    """
+    Submit a task to the worker pool and return an awaitable for its result.
+    
+    The result is delivered back to the event loop from the pool's result
+    handler thread, so no executor thread is held for the task's duration.
+    
+    Args:
+        func: Picklable function to run in a worker
+        args (tuple): Arguments to call func with
+        
+    Returns:
+        asyncio.Future: Future resolved with the task's result or exception
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def _resolve(setter, value):
+        if not future.done():
+            setter(value)
+
+    def _deliver(setter, value):
+        try:
+            loop.call_soon_threadsafe(_resolve, setter, value)
+        except RuntimeError:
+            # The event loop has already been closed during shutdown
+            pass
+
+    EXECUTOR_POOL.apply_async(
+        func,
+        args,
+        callback=lambda result: _deliver(future.set_result, result),
+        error_callback=lambda error: _deliver(future.set_exception, error)
+    )
+    return future
+
+async def execute_code(code: str, filename: str = USER_CODE_FILENAME) -> ExecutionResponse:
     """
-    Execute a Python script and return its output.
+    Execute Python source code and return its output.
     
     Args:
-        script_path (str): Path to the Python script to execute
+        code (str): Python source code to execute
+        filename (str): Script filename, exposed to the code as __file__
         
     Returns:
         ExecutionResponse: Object containing execution results
     """
     try:
-        # Verify the script exists
-        script = Path(script_path)
-        if not script.exists():
-            return ExecutionResponse(
-                success=False,
-                error=f"Script not found: {script_path}"
+        # Execute the code in the worker pool
+        logging.debug("Executing script")
+        # The worker kills the script at EXEC_TIMEOUT itself. The outer
+        # timeout starts once a worker slot is held, so it only covers a
+        # worker process that dies mid-task, whose result the pool would
+        # otherwise never deliver
+        async with EXECUTOR_SLOTS:
+            success, stdout, stderr = await asyncio.wait_for(
+                _submit_to_pool(run_user_code, (code, filename)),
+                timeout=EXEC_TIMEOUT + 5
             )
         
-        # Execute the script using subprocess
-        logging.info(f"Executing script: {script_path}")
-        result = subprocess.run(
-            [sys.executable, script_path],
-            capture_output=True,
-            text=True
-        )
-        
-        if result.returncode == 0:
-            logging.info("Script execution completed successfully")
+        if success:
+            logging.debug("Script execution completed successfully")
             return ExecutionResponse(
                 success=True,
-                output=result.stdout
+                output=stdout
             )
         else:
-            logging.error(f"Script execution failed with return code {result.returncode}")
+            logging.error("Script execution failed")
             return ExecutionResponse(
                 success=False,
-                error=result.stderr
+                error=stderr
             )
     
+    except OutputLimitError as e:
+        logging.error(str(e))
+        raise HTTPException(
+            status_code=413,
+            detail=str(e)
+        )
+    except asyncio.TimeoutError:
+        logging.error("Worker did not return a result")
+        return ExecutionResponse(
+            success=False,
+            error="Script execution failed: the worker process did not return a result"
+        )
     except Exception as e:
         logging.error(f"Unexpected error: {str(e)}")
         return ExecutionResponse(
@@ -101,24 +249,7 @@ async def execute_code_endpoint(code_request: CodeRequest) -> ExecutionResponse:
     """
     Endpoint to execute Python code sent as JSON.
     """
-    # Create a temporary directory to store the script
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir) / "script.py"
-        
-        # Save the code to a temporary file
-        try:
-            with open(temp_path, 'w') as f:
-                f.write(code_request.code)
-        except Exception as e:
-            logging.error(f"Error saving code to file: {e}")
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to process code"
-            )
-
-        # Execute the script
-        result = await execute_script(str(temp_path))
-        return result
+    return await execute_code(code_request.code)
 
 @app.post("/execute-file", response_model=ExecutionResponse)
 async def execute_file_endpoint(script: UploadFile = File(...)) -> ExecutionResponse:
@@ -131,30 +262,39 @@ async def execute_file_endpoint(script: UploadFile = File(...)) -> ExecutionResp
             detail="Only Python files (.py) are allowed"
         )
 
-    # Create a temporary directory to store the uploaded script
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir) / script.filename
-        
-        # Save the uploaded file
-        try:
-            contents = await script.read()
-            with open(temp_path, 'wb') as f:
-                f.write(contents)
-        except Exception as e:
-            logging.error(f"Error saving uploaded file: {e}")
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to process uploaded file"
-            )
+    # The multipart parser has already spooled the whole upload and set its
+    # size; checking it keeps oversized files from being read into memory
+    if script.size > MAX_CODE_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Uploaded file exceeds {MAX_CODE_SIZE} bytes"
+        )
+
+    # Read the uploaded file
+    try:
+        code = (await script.read()).decode()
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=400,
+            detail="Uploaded file must be UTF-8 encoded"
+        )
+    except Exception as e:
+        logging.error(f"Error reading uploaded file: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to process uploaded file"
+        )
+
+    # Execute the script
+    return await execute_code(code, os.path.basename(script.filename))
 
-        # Execute the script
-        result = await execute_script(str(temp_path))
-        return result
+# Serialized once; load balancers poll this endpoint frequently
+HEALTH_RESPONSE = ORJSONResponse({"status": "healthy"})
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy"}
+    return HEALTH_RESPONSE
 
 if __name__ == "__main__":
     import uvicorn
@@ -184,13 +324,15 @@ if __name__ == "__main__":
     # Verify certificate files exist
     if not cert_dir:
         print(f"Warning: SSL certificate files not found in any of: {', '.join(cert_paths)}. Running in HTTP mode.")
-        uvicorn.run(app, host="0.0.0.0", port=8000)
+        uvicorn.run(app, host="0.0.0.0", port=8000, loop="uvloop", http="httptools")
     else:
         print(f"Starting server with HTTPS support using certificates from {cert_dir}")
         uvicorn.run(
             app,
             host="0.0.0.0",
             port=8000,  # Using port 8000 for both HTTP and HTTPS
+            loop="uvloop",
+            http="httptools",
             ssl_keyfile=ssl_keyfile,
             ssl_certfile=ssl_certfile
         ) 
\ No newline at end of file
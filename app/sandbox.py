@@ -0,0 +1,289 @@
+"""
+Runs user-submitted Python code on behalf of the API server.
+
+This module is preloaded into the forkserver and imported by the pool
+workers, so it must not import the web stack. Each script runs in a child
+forked from a long-lived pool worker: the child's stdout and stderr file
+descriptors are pipes read by the worker, so output from subprocesses and
+C extensions is captured too, and the worker can always SIGKILL the child
+when it runs too long or writes too much.
+"""
+
+import atexit
+import linecache
+import os
+import selectors
+import signal
+import sys
+import threading
+import time
+import traceback
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+# Filename reported in tracebacks for submitted code
+USER_CODE_FILENAME = "<user>"
+
+# Limits applied to every script execution
+EXEC_TIMEOUT = 30
+MAX_OUTPUT_SIZE = 1024 * 1024
+
+READ_CHUNK_SIZE = 64 * 1024
+
+# Compiled code is cached per worker, but only for sources up to
+# COMPILE_CACHE_MAX_SOURCE characters so the cache stays bounded in bytes
+COMPILE_CACHE_SIZE = 512
+COMPILE_CACHE_MAX_SOURCE = 16 * 1024
+
+# Errors compile() raises for sources it cannot handle
+COMPILE_ERRORS = (SyntaxError, ValueError, MemoryError, RecursionError)
+
+# Pid of the child currently running user code in this worker
+_current_child = None
+
+class OutputLimitError(Exception):
+    """Raised when a script writes more than the allowed amount of output"""
+
+def _terminate_worker(signum, frame):
+    # Take the running script's process group down with the worker
+    if _current_child is not None:
+        try:
+            os.killpg(_current_child, signal.SIGKILL)
+        except OSError:
+            pass
+    signal.signal(signum, signal.SIG_DFL)
+    os.kill(os.getpid(), signum)
+
+def init_worker():
+    """
+    Pool initializer: kill the running script when the worker is terminated.
+
+    Scripts run in their own process group, so without this a script would
+    outlive a worker stopped by Pool.terminate().
+    """
+    signal.signal(signal.SIGTERM, _terminate_worker)
+
+@lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def _compile_cached(code: str, filename: str):
+    return compile(code, filename, "exec")
+
+def _compile(code: str, filename: str):
+    """
+    Compile Python source, reusing the result for repeated small submissions.
+
+    Args:
+        code (str): Python source code to compile
+        filename (str): Filename reported in tracebacks
+
+    Returns:
+        Code object for the source
+    """
+    if len(code) <= COMPILE_CACHE_MAX_SOURCE:
+        return _compile_cached(code, filename)
+    return compile(code, filename, "exec")
+
+def _exec_user_code(code_obj, filename: str) -> int:
+    """
+    Execute a code object the way the interpreter runs a script.
+
+    Args:
+        code_obj: Compiled user code
+        filename (str): Value exposed to the script as __file__
+
+    Returns:
+        int: Exit status the interpreter would have used
+    """
+    try:
+        exec(code_obj, {
+            "__name__": "__main__",
+            "__file__": filename,
+            "__builtins__": __builtins__
+        })
+    except SystemExit as e:
+        # Mirror the interpreter's handling of sys.exit()
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code & 0xFF
+        print(e.code, file=sys.stderr)
+        return 1
+    except BaseException as e:
+        # Skip this function's own frame so only user code is reported
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        return 1
+    return 0
+
+def _child_main(code_obj, code: str, filename: str, stdout_fd: int, stderr_fd: int) -> int:
+    """
+    Set up the forked child's process state and run the user code in it.
+
+    Returns:
+        int: Exit status for the child
+    """
+    # Make the source available to linecache so tracebacks show code lines;
+    # registered in the child so the entry dies with it instead of
+    # accumulating in the long-lived worker
+    linecache.cache[filename] = (
+        len(code), None, code.splitlines(keepends=True), filename
+    )
+    # Own process group, so the worker can kill anything the script starts
+    os.setpgid(0, 0)
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.dup2(stdout_fd, 1)
+    os.dup2(stderr_fd, 2)
+    # Don't let user code reach the worker's pool pipes
+    os.closerange(3, os.sysconf("SC_OPEN_MAX"))
+
+    sys.stdin = sys.__stdin__ = open(0, closefd=False)
+    sys.stdout = sys.__stdout__ = open(1, "w", closefd=False)
+    sys.stderr = sys.__stderr__ = open(
+        2, "w", buffering=1, errors="backslashreplace", closefd=False
+    )
+    sys.argv = [filename]
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    atexit._clear()
+
+    status = _exec_user_code(code_obj, filename)
+
+    # Finish like the interpreter would: wait for non-daemon threads, run
+    # exit handlers, then flush the streams
+    main_thread = threading.main_thread()
+    for thread in threading.enumerate():
+        if thread is not main_thread and not thread.daemon:
+            thread.join()
+    atexit._run_exitfuncs()
+    for stream in (sys.stdout, sys.stderr, sys.__stdout__, sys.__stderr__):
+        try:
+            stream.flush()
+        except Exception:
+            pass
+    return status
+
+def _read_output(fds: Dict[int, bytearray], deadline: float, max_output: int) -> Tuple[bool, bool]:
+    """
+    Read the child's output pipes until they close, time runs out or a
+    stream grows past max_output bytes.
+
+    Returns:
+        Tuple[bool, bool]: Whether the deadline passed and whether the
+        output limit was exceeded
+    """
+    with selectors.DefaultSelector() as selector:
+        for fd in fds:
+            selector.register(fd, selectors.EVENT_READ)
+        while selector.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True, False
+            for key, _ in selector.select(remaining):
+                chunk = os.read(key.fd, READ_CHUNK_SIZE)
+                if not chunk:
+                    selector.unregister(key.fd)
+                    continue
+                buffer = fds[key.fd]
+                buffer += chunk
+                if len(buffer) > max_output:
+                    return False, True
+    return False, False
+
+def _wait_for_child(pid: int, deadline: float) -> Optional[int]:
+    """
+    Wait for the child to exit, giving up at the deadline.
+
+    Returns:
+        Optional[int]: Wait status, or None if the child is still running
+    """
+    delay = 0.0005
+    while True:
+        waited, status = os.waitpid(pid, os.WNOHANG)
+        if waited:
+            return status
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+
+def run_user_code(
+    code: str,
+    filename: str = USER_CODE_FILENAME,
+    timeout: float = EXEC_TIMEOUT,
+    max_output: int = MAX_OUTPUT_SIZE
+) -> Tuple[bool, str, str]:
+    """
+    Compile user code and run it in a forked child, capturing its output.
+
+    Args:
+        code (str): Python source code to execute
+        filename (str): Script filename, used for __file__ and tracebacks
+        timeout (float): Seconds before the child is killed
+        max_output (int): Maximum bytes accepted on stdout or stderr
+
+    Returns:
+        Tuple[bool, str, str]: Success flag, captured stdout and captured stderr
+
+    Raises:
+        OutputLimitError: If the script wrote more than max_output bytes
+    """
+    try:
+        code_obj = _compile(code, filename)
+    except COMPILE_ERRORS as e:
+        return False, "", "".join(traceback.format_exception_only(type(e), e))
+
+    global _current_child
+    deadline = time.monotonic() + timeout
+    stdout_r, stdout_w = os.pipe()
+    stderr_r, stderr_w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            status = _child_main(code_obj, code, filename, stdout_w, stderr_w)
+        finally:
+            # Never return into the pool worker's loop
+            os._exit(status)
+
+    _current_child = pid
+    # Also set the process group here so killpg works even if the child has
+    # not got that far yet
+    try:
+        os.setpgid(pid, pid)
+    except OSError:
+        pass
+    os.close(stdout_w)
+    os.close(stderr_w)
+    stdout = bytearray()
+    stderr = bytearray()
+    status = None
+    try:
+        timed_out, output_exceeded = _read_output(
+            {stdout_r: stdout, stderr_r: stderr}, deadline, max_output
+        )
+        if not timed_out and not output_exceeded:
+            status = _wait_for_child(pid, deadline)
+            timed_out = status is None
+    finally:
+        os.close(stdout_r)
+        os.close(stderr_r)
+        # Kill the child and anything it left behind in its process group
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except OSError:
+            if status is None:
+                os.kill(pid, signal.SIGKILL)
+        if status is None:
+            _, status = os.waitpid(pid, 0)
+        _current_child = None
+
+    if output_exceeded:
+        raise OutputLimitError(f"Script output exceeds {max_output} bytes")
+
+    error = stderr.decode(errors="replace")
+    if timed_out:
+        error += f"Script execution timed out after {timeout} seconds\n"
+        return False, stdout.decode(errors="replace"), error
+    if os.WIFSIGNALED(status):
+        error += f"Script was terminated by signal {signal.Signals(os.WTERMSIG(status)).name}\n"
+        return False, stdout.decode(errors="replace"), error
+    return os.waitstatus_to_exitcode(status) == 0, stdout.decode(errors="replace"), error
@@ -3,7 +3,6 @@
 import sys
 import logging
 import subprocess
-from pathlib import Path
 from typing import Optional
 
 # Configure logging
@@ -16,6 +15,9 @@ logging.basicConfig(
     ]
 )
 
+# Interpreter used to run scripts, resolved once at import
+_PY = sys.executable
+
 def execute_script(script_path: str) -> Optional[str]:
     """
     Execute a Python script and return its output.
@@ -27,26 +29,23 @@ def execute_script(script_path: str) -> Optional[str]:
         Optional[str]: Output of the script if successful, None if failed
     """
     try:
-        # Verify the script exists
-        script = Path(script_path)
-        if not script.exists():
-            raise FileNotFoundError(f"Script not found: {script_path}")
-        
-        # Execute the script using subprocess
+        # Execute the script using subprocess; a missing script makes the
+        # interpreter exit with an error, reported like any other failure
         logging.info(f"Executing script: {script_path}")
+        # close_fds=False (and no preexec_fn, cwd or session changes) lets
+        # subprocess launch via posix_spawn instead of fork + exec; file
+        # descriptors are non-inheritable by default, so none leak
         result = subprocess.run(
-            [sys.executable, script_path],
+            [_PY, script_path],
             capture_output=True,
             text=True,
-            check=True
+            check=True,
+            close_fds=False
         )
         
         logging.info("Script execution completed successfully")
         return result.stdout
     
-    except FileNotFoundError as e:
-        logging.error(f"File error: {e}")
-        return None
     except subprocess.CalledProcessError as e:
         logging.error(f"Script execution failed with return code {e.returncode}")
         logging.error(f"Error output: {e.stderr}")
@@ -0,0 +1,45 @@
+import asyncio
+import importlib.util
+import multiprocessing
+import sys
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from sandbox import init_worker
+
+
+@unittest.skipUnless(importlib.util.find_spec("fastapi"), "fastapi is not installed")
+class ExecuteCodeTest(unittest.TestCase):
+    def setUp(self):
+        import api_server
+        self.api_server = api_server
+        ctx = multiprocessing.get_context("forkserver")
+        api_server.EXECUTOR_POOL = ctx.Pool(processes=1, initializer=init_worker)
+        self.addCleanup(api_server.EXECUTOR_POOL.join)
+        self.addCleanup(api_server.EXECUTOR_POOL.terminate)
+        # Outer timeout of 5 seconds, shorter than the queue below takes
+        self.original_timeout = api_server.EXEC_TIMEOUT
+        api_server.EXEC_TIMEOUT = 0
+        self.addCleanup(setattr, api_server, "EXEC_TIMEOUT", self.original_timeout)
+
+    def test_queued_requests_are_not_timed_out(self):
+        async def run():
+            self.api_server.EXECUTOR_SLOTS = asyncio.Semaphore(1)
+            code = 'import time; time.sleep(2); print("done")'
+            return await asyncio.gather(
+                *(self.api_server.execute_code(code) for _ in range(3))
+            )
+
+        start = time.monotonic()
+        results = asyncio.run(run())
+        self.assertGreater(time.monotonic() - start, 6)
+        for result in results:
+            self.assertTrue(result.success, result.error)
+            self.assertEqual(result.output, "done\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
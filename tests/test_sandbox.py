@@ -0,0 +1,152 @@
+import linecache
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+import sandbox
+from sandbox import OutputLimitError, run_user_code
+
+
+def _process_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # A killed process may linger as a zombie until its parent reaps it
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split()[2] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+class RunUserCodeTest(unittest.TestCase):
+    def test_captures_stdout(self):
+        self.assertEqual(run_user_code('print("hi")'), (True, "hi\n", ""))
+
+    def test_captures_output_written_at_fd_level(self):
+        success, stdout, _ = run_user_code(
+            'import os, sys\n'
+            'os.system("echo shell")\n'
+            'sys.__stdout__.write("raw\\n")\n'
+        )
+        self.assertTrue(success)
+        self.assertIn("shell\n", stdout)
+        self.assertIn("raw\n", stdout)
+
+    def test_reports_traceback(self):
+        success, _, stderr = run_user_code("x = 1\n1/0\n")
+        self.assertFalse(success)
+        self.assertIn('File "<user>", line 2', stderr)
+        self.assertIn("ZeroDivisionError", stderr)
+
+    def test_sys_exit(self):
+        self.assertEqual(run_user_code("import sys; sys.exit(0)"), (True, "", ""))
+        self.assertEqual(run_user_code('import sys; sys.exit("bad")'), (False, "", "bad\n"))
+
+    def test_sets_file(self):
+        success, stdout, _ = run_user_code("print(__file__)", "job.py")
+        self.assertEqual((success, stdout), (True, "job.py\n"))
+
+    def test_source_is_not_kept_in_worker_linecache(self):
+        before = set(linecache.cache)
+        for i in range(5):
+            success, _, stderr = run_user_code("x = 1\n1/0\n", f"job{i}.py")
+            self.assertFalse(success)
+            self.assertIn("    1/0\n", stderr)
+        self.assertEqual(set(linecache.cache) - before, set())
+
+    def test_compile_errors(self):
+        success, _, stderr = run_user_code("def (:")
+        self.assertFalse(success)
+        self.assertIn("SyntaxError", stderr)
+        success, _, stderr = run_user_code("-" * 200000 + "1")
+        self.assertFalse(success)
+        self.assertIn("Error", stderr)
+
+    def test_timeout_kills_script(self):
+        start = time.monotonic()
+        success, _, stderr = run_user_code(
+            "import signal\n"
+            "signal.signal(signal.SIGALRM, signal.SIG_IGN)\n"
+            "signal.setitimer(signal.ITIMER_REAL, 0)\n"
+            "while True:\n"
+            "    pass\n",
+            timeout=0.5
+        )
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertFalse(success)
+        self.assertIn("timed out", stderr)
+
+    def test_timeout_kills_processes_started_by_script(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            pid_file = Path(temp_dir) / "pid"
+            run_user_code(
+                "import subprocess\n"
+                f"p = subprocess.Popen(['sleep', '60'])\n"
+                f"open({str(pid_file)!r}, 'w').write(str(p.pid))\n"
+                "p.wait()\n",
+                timeout=0.5
+            )
+            self.assertFalse(_process_exists(int(pid_file.read_text())))
+
+    def test_output_limit(self):
+        with self.assertRaises(OutputLimitError):
+            run_user_code('while True: print("x" * 100)', max_output=10_000)
+        with self.assertRaises(OutputLimitError):
+            run_user_code('import os; os.system("yes")', max_output=10_000)
+
+    def test_os_exit(self):
+        self.assertEqual(run_user_code("import os; os._exit(0)"), (True, "", ""))
+        self.assertEqual(run_user_code("import os; os._exit(3)"), (False, "", ""))
+
+    def test_killed_script_is_reported(self):
+        success, _, stderr = run_user_code(
+            "import os, signal; os.kill(os.getpid(), signal.SIGKILL)"
+        )
+        self.assertFalse(success)
+        self.assertIn("terminated by signal SIGKILL", stderr)
+
+
+class PoolTest(unittest.TestCase):
+    def setUp(self):
+        ctx = multiprocessing.get_context("forkserver")
+        self.pool = ctx.Pool(processes=1, initializer=sandbox.init_worker)
+
+    def tearDown(self):
+        self.pool.terminate()
+        self.pool.join()
+
+    def test_worker_survives_dead_script(self):
+        self.assertFalse(self.pool.apply(run_user_code, ("import os; os._exit(1)",))[0])
+        self.assertEqual(self.pool.apply(run_user_code, ('print("ok")',)), (True, "ok\n", ""))
+
+    def test_terminate_kills_running_script(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            pid_file = Path(temp_dir) / "pid"
+            self.pool.apply_async(run_user_code, (
+                "import os, time\n"
+                f"open({str(pid_file)!r}, 'w').write(str(os.getpid()))\n"
+                "time.sleep(60)\n",
+            ))
+            deadline = time.monotonic() + 10
+            while not pid_file.exists() or not pid_file.read_text():
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.05)
+            pid = int(pid_file.read_text())
+            self.pool.terminate()
+            self.pool.join()
+            deadline = time.monotonic() + 5
+            while _process_exists(pid):
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.05)
+
+
+if __name__ == "__main__":
+    unittest.main()